@@ -0,0 +1,128 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Optional AOT-compiled execution core for CPYU-V16.
+
+Build with:  python setup.py build_ext --inplace
+
+cpyu.py picks this up automatically when the extension is importable and
+falls back to the pure-Python interpreter (or the numba kernel) otherwise.
+The kernel mirrors cpyu._run_kernel: it executes the SoA-decoded program
+until HALT, an IN/OUT instruction (which stay in Python), or the step
+budget runs out, and reports why it stopped.
+
+The opcode ids below must stay in sync with cpyu.OPCODES.
+"""
+
+# Exit reasons (same values as cpyu._KERNEL_*)
+DEF KERNEL_DONE = 0
+DEF KERNEL_IO = 1
+DEF KERNEL_BUDGET = 2
+
+# Opcode ids (see cpyu.OPCODES)
+DEF OP_ADD = 0
+DEF OP_ADDI = 1
+DEF OP_SUB = 2
+DEF OP_AND = 3
+DEF OP_OR = 4
+DEF OP_XOR = 5
+DEF OP_LD = 6
+DEF OP_ST = 7
+DEF OP_BEQ = 8
+DEF OP_BNE = 9
+DEF OP_JMP = 10
+DEF OP_IN = 11
+DEF OP_OUT = 12
+DEF OP_HALT = 13
+DEF OP_LI = 14
+DEF OP_MOV = 15
+DEF OP_LI2 = 16   # quickened LI;ADDI pair (decode-internal, see cpyu._OP_LI2)
+DEF OP_ADDN = 17  # folded straight-line ADDI chain (see cpyu._OP_ADDN)
+
+
+def run_kernel(const unsigned char[::1] op_arr,
+               const long[::1] a0_arr,
+               const long[::1] a1_arr,
+               const long[::1] a2_arr,
+               unsigned short[::1] reg,
+               unsigned short[::1] mem,
+               long pc,
+               long max_steps):
+    # reg/mem are the live array('H') buffers of the CPU object — uint16
+    # arithmetic wraps in hardware and r0 stays 0 because it is never
+    # written. LD/ST addresses were range-checked by the assembler.
+    cdef long steps = 0
+    cdef long n = op_arr.shape[0]
+    cdef int op
+    cdef long a0, a1, a2, k
+
+    while steps < max_steps:
+        if pc < 0 or pc >= n:
+            return pc, steps, KERNEL_DONE
+        op = op_arr[pc]
+        if op == OP_IN or op == OP_OUT:
+            return pc, steps, KERNEL_IO
+        a0 = a0_arr[pc]
+        a1 = a1_arr[pc]
+        a2 = a2_arr[pc]
+        pc += 1
+        if op == OP_ADD:
+            if a0 != 0:
+                reg[a0] = <unsigned short> (reg[a1] + reg[a2])
+        elif op == OP_ADDI:
+            if a0 != 0:
+                reg[a0] = <unsigned short> (reg[a1] + a2)
+        elif op == OP_LI:
+            if a0 != 0:
+                reg[a0] = <unsigned short> a1
+        elif op == OP_MOV:
+            if a0 != 0:
+                reg[a0] = reg[a1]
+        elif op == OP_LI2:
+            # Fused LI;ADDI: one dispatch, two architectural steps. With a
+            # single step of budget left, do only the original LI (a2); the
+            # untouched ADDI at pc runs on the next entry.
+            if steps + 2 <= max_steps:
+                reg[a0] = <unsigned short> a1
+                pc += 1
+                steps += 1
+            else:
+                reg[a0] = <unsigned short> a2
+        elif op == OP_ADDN:
+            # Folded ADDI chain: one dispatch, k architectural steps, with
+            # the same single-ADDI fallback when the budget cannot cover it.
+            k = a2 >> 16
+            if steps + k <= max_steps:
+                reg[a0] = <unsigned short> (reg[a0] + a1)
+                pc += k - 1
+                steps += k - 1
+            else:
+                reg[a0] = <unsigned short> (reg[a0] + (a2 & 0xFFFF))
+        elif op == OP_SUB:
+            if a0 != 0:
+                reg[a0] = <unsigned short> (reg[a1] - reg[a2])
+        elif op == OP_AND:
+            if a0 != 0:
+                reg[a0] = reg[a1] & reg[a2]
+        elif op == OP_OR:
+            if a0 != 0:
+                reg[a0] = reg[a1] | reg[a2]
+        elif op == OP_XOR:
+            if a0 != 0:
+                reg[a0] = reg[a1] ^ reg[a2]
+        elif op == OP_LD:
+            if a0 != 0:
+                reg[a0] = mem[a1]
+        elif op == OP_ST:
+            mem[a1] = reg[a0]
+        elif op == OP_BEQ:
+            if reg[a0] == reg[a1]:
+                pc = a2
+        elif op == OP_BNE:
+            if reg[a0] != reg[a1]:
+                pc = a2
+        elif op == OP_JMP:
+            pc = a0
+        elif op == OP_HALT:
+            return pc, steps, KERNEL_DONE
+        steps += 1
+    return pc, steps, KERNEL_BUDGET
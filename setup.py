@@ -0,0 +1,14 @@
+"""Optional build of the AOT-compiled execution core.
+
+    python setup.py build_ext --inplace
+
+Requires Cython and a C compiler; the simulator works without it.
+"""
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name='cpyu-core',
+    ext_modules=cythonize('cpyu_core.pyx', language_level=3),
+)